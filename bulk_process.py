@@ -3,39 +3,103 @@
 
 Iterates through all CSV files in a directory and evaluates each using the
 current CONFIG settings. Results are written to the output directory with the
-same base filename as the input.
+same base filename as the input. Files are independent, so they are streamed
+to parallel worker processes as the directory is scanned.
 """
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from functools import partial
+from itertools import chain, islice
 from pathlib import Path
+from typing import Optional
 import argparse
+import io
+import os
 
 from config import CONFIG
 from flare import process_grayscale, process_rgb
 
-def bulk_process(input_dir: Path, output_dir: Path) -> None:
+def process_file(csv_file: Path, output_dir: Path, mode: str, config: Optional[dict] = None) -> dict:
+    """Evaluate a single CSV file and write its JSON and PNG outputs.
+
+    ``config`` is a snapshot of the caller's CONFIG. Worker processes started
+    with spawn or forkserver re-import config.py, so the snapshot is applied
+    first to keep any runtime overrides.
+
+    The file's output is collected and printed in one write once it is
+    done, so reports from parallel workers stay together with their header.
+    """
+    if config is not None:
+        CONFIG.update(config)
+    stem = csv_file.stem
+    json_path = output_dir / f"{stem}.json"
+    png_path = output_dir / f"{stem}.png"
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            print(f"\n=== Processing {csv_file} ===")
+            if mode == 'rgb':
+                return process_rgb(csv_file, output_json=json_path, output_image=png_path)
+            return process_grayscale(csv_file, output_json=json_path, output_image=png_path)
+    finally:
+        print(output.getvalue(), end='', flush=True)
+
+
+def iter_csv_files(input_dir: Path):
+    """Yield CSV files from input_dir as the directory is scanned."""
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.csv') and entry.is_file():
+                yield Path(entry.path)
+
+
+def bulk_process(input_dir: Path, output_dir: Path, workers: Optional[int] = None) -> None:
     mode = CONFIG.get('mode', 'grayscale')
     input_dir = Path(input_dir)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    for csv_file in sorted(input_dir.glob('*.csv')):
-        stem = csv_file.stem
-        json_path = output_dir / f"{stem}.json"
-        png_path = output_dir / f"{stem}.png"
-        print(f"\n=== Processing {csv_file} ===")
-        if mode == 'rgb':
-            process_rgb(csv_file, output_json=json_path, output_image=png_path)
-        else:
-            process_grayscale(csv_file, output_json=json_path, output_image=png_path)
+    files = iter_csv_files(input_dir)
+    worker = partial(process_file, output_dir=output_dir, mode=mode, config=dict(CONFIG))
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # A single input file is not worth starting a worker pool for
+    if workers > 1:
+        head = list(islice(files, 2))
+        files = chain(head, files)
+        if len(head) < 2:
+            workers = 1
+
+    if workers <= 1:
+        # Serial runs keep a deterministic, sorted order
+        for csv_file in sorted(files):
+            worker(csv_file)
+        return
+
+    # Submit files as they are discovered, keeping at most 2x workers queued
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = set()
+        for csv_file in files:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(ex.submit(worker, csv_file))
+        for future in pending:
+            future.result()
 
 
 def main():
     parser = argparse.ArgumentParser(description="Bulk process CSV files for flare evaluation")
     parser.add_argument('input_dir', nargs='?', default='data', help='Directory containing CSV files')
     parser.add_argument('output_dir', nargs='?', default='output', help='Directory to save outputs')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Number of worker processes (default: CPU count, 1 = serial)')
     args = parser.parse_args()
 
-    bulk_process(Path(args.input_dir), Path(args.output_dir))
+    bulk_process(Path(args.input_dir), Path(args.output_dir), workers=args.workers)
 
 if __name__ == '__main__':
     main()
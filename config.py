@@ -15,6 +15,8 @@ CONFIG = {
     # Output files (both generated automatically)
     'output_json': 'output/results.json',       # Metrics results
     'output_image': 'output/visualization.png',  # Visual output
+    'save_image': True,         # Set False to write metrics only (skips visualization)
+    'png_compress_level': 6,    # PNG zlib level: 1 = fastest/largest, 9 = slowest/smallest
     
     # Sensor parameters
     'pixel_pitch': 2.4,     # Pixel pitch in micrometers
@@ -6,10 +6,10 @@ Usage: python flare.py
 """
 
 import numpy as np
+import io
 import json
 import sys
 from pathlib import Path
-from PIL import Image
 
 # Import configuration
 try:
@@ -27,6 +27,151 @@ except ImportError:
         'beta': 0.5
     }
 
+# Rule printed around result blocks
+SEPARATOR = "=" * 60
+
+# Visualization colour per pixel class (indexed by label_pixels() output)
+CLASS_COLORS = np.array([
+    [0, 0, 0],        # Background (keeps base intensity)
+    [255, 255, 0],    # Yellow for flare
+    [255, 165, 0],    # Orange for direct illumination
+    [255, 0, 0],      # Red for light sources
+], dtype=np.uint8)
+
+def thresholds_ascending(offset, signal_threshold, direct_threshold, light_threshold):
+    """Return True when offset + signal <= direct <= light (the usual setup)."""
+    return offset + signal_threshold <= direct_threshold <= light_threshold
+
+def class_masks(data, offset, signal_threshold, direct_threshold, light_threshold):
+    """Return the flare, direct and light masks, evaluated independently.
+
+    Used when the thresholds are not ascending, where the classes may be
+    empty or overlap.
+    """
+    flare_mask = (data > offset + signal_threshold) & (data <= direct_threshold)
+    direct_mask = (data > direct_threshold) & (data <= light_threshold)
+    light_mask = data > light_threshold
+    return flare_mask, direct_mask, light_mask
+
+def labels_from_masks(shape, masks):
+    """Label pixels from class masks; later classes override earlier ones."""
+    labels = np.zeros(shape, dtype=np.intp)
+    for label, mask in enumerate(masks, start=1):
+        labels[mask] = label
+    return labels
+
+def label_pixels(data, offset, signal_threshold, direct_threshold, light_threshold):
+    """Label pixels 0=background, 1=flare, 2=direct, 3=light.
+
+    Ascending thresholds take a single np.digitize pass. Otherwise the masks
+    are applied in class order, so light overrides direct overrides flare.
+    NaN pixels are background.
+    """
+    if not thresholds_ascending(offset, signal_threshold, direct_threshold, light_threshold):
+        masks = class_masks(data, offset, signal_threshold, direct_threshold, light_threshold)
+        return labels_from_masks(data.shape, masks)
+
+    labels = np.digitize(data, [offset + signal_threshold, direct_threshold, light_threshold], right=True)
+    # digitize sorts NaN past the last bin; every mask comparison is False
+    nan_mask = np.isnan(data)
+    if nan_mask.any():
+        labels[nan_mask] = 0
+    return labels
+
+def classify_pixels(data, offset, signal_threshold, direct_threshold, light_threshold):
+    """Classify pixels and histogram them by class.
+
+    Parameters
+    ----------
+    data : ndarray
+        Pixel values in ADU.
+    offset, signal_threshold, direct_threshold, light_threshold : float
+        Thresholds from CONFIG.
+
+    Returns
+    -------
+    labels : ndarray
+        Class per pixel: 0=background, 1=flare, 2=direct, 3=light.
+    counts : ndarray
+        Pixel count per class.
+    sums : ndarray
+        Sum of raw ADU values per class.
+
+    Notes
+    -----
+    With ascending thresholds the classes partition the sensor and counts
+    and sums come from one bincount pass over the labels. Otherwise each
+    class is counted from its own mask, so a pixel can fall in more than
+    one class, exactly as with independent masks.
+    """
+    if thresholds_ascending(offset, signal_threshold, direct_threshold, light_threshold):
+        labels = label_pixels(data, offset, signal_threshold, direct_threshold, light_threshold)
+        flat_labels = labels.ravel()
+        counts = np.bincount(flat_labels, minlength=4)
+        sums = np.bincount(flat_labels, weights=data.ravel(), minlength=4)
+        return labels, counts, sums
+
+    masks = class_masks(data, offset, signal_threshold, direct_threshold, light_threshold)
+    labels = labels_from_masks(data.shape, masks)
+    counts = np.zeros(4, dtype=np.intp)
+    sums = np.zeros(4)
+    counts[0] = np.count_nonzero(labels == 0)
+    for label, mask in enumerate(masks, start=1):
+        counts[label] = np.count_nonzero(mask)
+        sums[label] = np.sum(data, where=mask)
+    return labels, counts, sums
+
+def check_parameters(pixel_pitch, beta):
+    """Exit with an error message if pixel_pitch or beta cannot be used."""
+    if pixel_pitch <= 0:
+        print(f"❌ Error: pixel_pitch must be greater than 0 (got {pixel_pitch})")
+        sys.exit(1)
+    if beta < 0:
+        print(f"❌ Error: beta must be 0 or greater (got {beta})")
+        sys.exit(1)
+
+def save_json(results, output_json):
+    """Write results as indented JSON.
+
+    Parameters
+    ----------
+    results : dict
+        Metrics to save.
+    output_json : str or Path
+        Destination file; parent directories are created as needed.
+    """
+    Path(output_json).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_json, 'w') as f:
+        json.dump(results, f, indent=2)
+
+def save_visualization(img, output_image):
+    """Save an RGB visualization image.
+
+    Pillow is imported here rather than at module level so metrics-only
+    runs (``save_image: False``) and help mode do not pay for it.
+
+    Parameters
+    ----------
+    img : ndarray
+        uint8 image of shape (height, width, 3).
+    output_image : str or Path
+        Destination file; parent directories are created as needed.
+    """
+    from PIL import Image
+
+    Path(output_image).parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(img).save(output_image, compress_level=CONFIG.get('png_compress_level', 6))
+
+def load_grayscale_csv(filepath):
+    """Load a grayscale CSV (one value per cell) as a 2-D float array.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        Input CSV file containing grayscale pixel values.
+    """
+    return np.loadtxt(filepath, delimiter=',', ndmin=2)
+
 def process_grayscale(filepath, output_json=None, output_image=None):
     """Process grayscale sensor data - evaluate and visualize.
 
@@ -43,7 +188,7 @@ def process_grayscale(filepath, output_json=None, output_image=None):
     
     # Load data
     try:
-        data = np.loadtxt(filepath, delimiter=',')
+        data = load_grayscale_csv(filepath)
     except Exception as e:
         print(f"❌ Error loading file: {e}")
         sys.exit(1)
@@ -56,54 +201,32 @@ def process_grayscale(filepath, output_json=None, output_image=None):
     direct_threshold = CONFIG.get('direct_threshold', 200)
     light_threshold = CONFIG.get('light_threshold', 250)
     beta = CONFIG.get('beta', 0.5)
+    check_parameters(pixel_pitch, beta)
     
-    # Classify pixels
-    flare_mask = (data > offset + signal_threshold) & (data <= direct_threshold)
-    direct_mask = (data > direct_threshold) & (data <= light_threshold)
-    light_mask = data > light_threshold
-    
+    # Classify pixels and get per-class counts/sums
+    labels, counts, sums = classify_pixels(data, offset, signal_threshold, direct_threshold, light_threshold)
+
     # Calculate metrics
-    N_sensor = data.size
-    N_flare = np.sum(flare_mask)
-    N_direct = np.sum(direct_mask)
-    N_light = np.sum(light_mask)
-    
-    # F_raw calculation
-    if N_flare > 0:
-        flare_values = data[flare_mask] - offset
-        F_raw = np.sum(flare_values) / (N_flare * pixel_area)
-    else:
-        F_raw = 0
-    
-    # F_norm calculation
-    F_norm = 0
-    if N_flare > 0 and N_direct > 0:
-        flare_values = data[flare_mask] - offset
-        direct_values = data[direct_mask] - offset
-        flare_intensity = np.sum(flare_values) / (N_flare * pixel_area)
-        direct_intensity = np.sum(direct_values) / (N_direct * pixel_area)
-        if direct_intensity > 0:
-            F_norm = flare_intensity / direct_intensity
-    
-    # F_final calculation
-    coverage_ratio = N_flare / N_sensor if N_sensor > 0 else 0
-    F_final = F_norm * (coverage_ratio ** beta)
-    
-    # Display results
-    print("\n" + "="*60)
-    print("FLARE EVALUATION RESULTS (Grayscale)")
-    print("="*60)
-    print(f"Sensor: {data.shape[0]}×{data.shape[1]} pixels")
-    print(f"Pixel pitch: {pixel_pitch:.2f} µm")
-    print(f"\n📊 Resolution-Independent Metrics:")
-    print(f"  F_raw:   {F_raw:.4f} ADU/µm²")
-    print(f"  F_norm:  {F_norm:.4f} (dimensionless)")
-    print(f"  F_final: {F_final:.6f} (coverage-weighted)")
-    print(f"\n📈 Detection Statistics:")
-    print(f"  Flare pixels:  {N_flare:,} ({coverage_ratio*100:.2f}%)")
-    print(f"  Direct pixels: {N_direct:,}")
-    print(f"  Light pixels:  {N_light:,}")
-    print("="*60)
+    N_flare, N_direct, N_light = counts[1:]
+    F_raw, F_norm, F_final, coverage_ratio = compute_flare_metrics(counts, sums, data.size, offset, pixel_area, beta)
+    
+    # Display results (one write, so parallel bulk runs don't interleave lines)
+    print("\n".join([
+        "\n" + SEPARATOR,
+        "FLARE EVALUATION RESULTS (Grayscale)",
+        SEPARATOR,
+        f"Sensor: {data.shape[0]}×{data.shape[1]} pixels",
+        f"Pixel pitch: {pixel_pitch:.2f} µm",
+        f"\n📊 Resolution-Independent Metrics:",
+        f"  F_raw:   {F_raw:.4f} ADU/µm²",
+        f"  F_norm:  {F_norm:.4f} (dimensionless)",
+        f"  F_final: {F_final:.6f} (coverage-weighted)",
+        f"\n📈 Detection Statistics:",
+        f"  Flare pixels:  {N_flare:,} ({coverage_ratio*100:.2f}%)",
+        f"  Direct pixels: {N_direct:,}",
+        f"  Light pixels:  {N_light:,}",
+        SEPARATOR,
+    ]))
     
     # Save JSON results
     results = {
@@ -120,67 +243,135 @@ def process_grayscale(filepath, output_json=None, output_image=None):
     
     if output_json is None:
         output_json = CONFIG.get('output_json', 'output/results.json')
-    Path(output_json).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_json, 'w') as f:
-        json.dump(results, f, indent=2)
+    save_json(results, output_json)
     print(f"\n✅ Results saved to: {output_json}")
     
+    if not CONFIG.get('save_image', True):
+        return results
+    
     # Create visualization
     print(f"\n🎨 Creating visualization...")
     height, width = data.shape
-    img = np.zeros((height, width, 3), dtype=np.uint8)
     
-    # Base intensity (dark background)
-    norm_data = (data - data.min()) / (data.max() - data.min() + 1e-10)
-    base = (norm_data * 50).astype(np.uint8)
-    img[:,:,0] = base
-    img[:,:,1] = base
-    img[:,:,2] = base
+    # Base intensity (dark background), cast to uint8 as it is broadcast
+    data_min, data_max = data.min(), data.max()
+    norm_data = data - data_min
+    norm_data /= data_max - data_min + 1e-10
+    norm_data *= 50
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = norm_data[:, :, None]
+    del norm_data
     
-    # Color code regions
-    img[flare_mask] = [255, 255, 0]      # Yellow for flare
-    img[direct_mask] = [255, 165, 0]     # Orange for direct illumination
-    img[light_mask] = [255, 0, 0]        # Red for light sources
+    # Color code regions with one palette gather over non-background pixels
+    classified = labels > 0
+    img[classified] = CLASS_COLORS[labels[classified]]
     
     # Save image
     if output_image is None:
         output_image = CONFIG.get('output_image', 'output/visualization.png')
-    Path(output_image).parent.mkdir(parents=True, exist_ok=True)
-    Image.fromarray(img).save(output_image)
+    save_visualization(img, output_image)
     print(f"✅ Visualization saved to: {output_image}")
     
     return results
 
-def process_rgb(filepath, output_json=None, output_image=None):
-    """Process RGB sensor data - evaluate and visualize.
+def compute_flare_metrics(counts, sums, n_sensor, offset, pixel_area, beta):
+    """Compute F_raw, F_norm and F_final from per-class counts and sums.
 
     Parameters
     ----------
-    filepath : str or Path
-        Input CSV file with space-separated R G B values per cell.
-    output_json : str or Path, optional
-        Path for metrics JSON output. Uses CONFIG when omitted.
-    output_image : str or Path, optional
-        Path for visualization PNG. Uses CONFIG when omitted.
+    counts, sums : ndarray
+        Per-class pixel counts and raw ADU sums from classify_pixels().
+    n_sensor : int
+        Total number of sensor pixels.
+    offset : float
+        Black level subtracted from every pixel value.
+    pixel_area : float
+        Pixel area in µm².
+    beta : float
+        Coverage weighting exponent.
+
+    Returns
+    -------
+    F_raw, F_norm, F_final, coverage_ratio : float
+    """
+    # Scalar math below runs on Python numbers, not NumPy scalars
+    N_sensor = int(n_sensor)
+    N_flare, N_direct = int(counts[1]), int(counts[2])
+    S_flare, S_direct = float(sums[1]), float(sums[2])
+
+    # F_raw calculation
+    if N_flare > 0:
+        F_raw = (S_flare - offset * N_flare) / (N_flare * pixel_area)
+    else:
+        F_raw = 0
+
+    # F_norm calculation
+    F_norm = 0
+    if N_flare > 0 and N_direct > 0:
+        flare_intensity = F_raw
+        direct_intensity = (S_direct - offset * N_direct) / (N_direct * pixel_area)
+        if direct_intensity > 0:
+            F_norm = flare_intensity / direct_intensity
+
+    # F_final calculation
+    coverage_ratio = N_flare / N_sensor if N_sensor > 0 else 0
+    F_final = F_norm * (coverage_ratio ** beta)
+
+    return F_raw, F_norm, F_final, coverage_ratio
+
+def evaluate_channel(data, offset, signal_threshold, direct_threshold, light_threshold,
+                     pixel_area, beta):
+    """Compute flare metrics for a single sensor channel.
+
+    Parameters
+    ----------
+    data : ndarray
+        Channel pixel values in ADU.
+    offset, signal_threshold, direct_threshold, light_threshold : float
+        Thresholds from CONFIG.
+    pixel_area : float
+        Pixel area in µm².
+    beta : float
+        Coverage weighting exponent.
+
+    Returns
+    -------
+    dict
+        F_raw, F_norm, F_final, flare_pixels and coverage_percent.
+    """
+    # Classify pixels and get per-class counts/sums
+    _, counts, sums = classify_pixels(data, offset, signal_threshold, direct_threshold, light_threshold)
+    F_raw, F_norm, F_final, coverage_ratio = compute_flare_metrics(counts, sums, data.size, offset, pixel_area, beta)
+
+    return {
+        'F_raw': F_raw,
+        'F_norm': F_norm,
+        'F_final': F_final,
+        'flare_pixels': int(counts[1]),
+        'coverage_percent': coverage_ratio * 100
+    }
+
+def parse_rgb_cells(lines, width):
+    """Parse RGB CSV lines cell by cell (handles mixed or irregular cells).
+
+    Parameters
+    ----------
+    lines : list of str
+        CSV rows with space-separated R G B values per cell.
+    width : int
+        Number of cells per row.
+
+    Returns
+    -------
+    r_data, g_data, b_data : ndarray
+        Channel arrays of shape (len(lines), width). Single-value cells are
+        copied to all three channels; cells with any other count stay zero.
     """
-    print(f"\n📊 Processing RGB data: {filepath}")
-    
-    # Load RGB data
-    try:
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-    except Exception as e:
-        print(f"❌ Error loading file: {e}")
-        sys.exit(1)
-    
     height = len(lines)
-    width = len(lines[0].strip().split(','))
-    
     r_data = np.zeros((height, width))
     g_data = np.zeros((height, width))
     b_data = np.zeros((height, width))
-    
-    # Parse RGB values (handles variable spacing)
+
     for row_idx, line in enumerate(lines):
         cells = line.strip().split(',')
         for col_idx, cell in enumerate(cells):
@@ -195,6 +386,91 @@ def process_rgb(filepath, output_json=None, output_image=None):
                 r_data[row_idx, col_idx] = value
                 g_data[row_idx, col_idx] = value
                 b_data[row_idx, col_idx] = value
+
+    return r_data, g_data, b_data
+
+def rows_have_width(raw, height, width):
+    """Return True when each of the first height lines has width cells.
+
+    Counts commas line by line in place, without splitting the buffer.
+    """
+    start = 0
+    for _ in range(height):
+        end = raw.find(b'\n', start)
+        if end == -1:
+            end = len(raw)
+        if raw.count(b',', start, end) != width - 1:
+            return False
+        start = end + 1
+    return True
+
+def load_rgb_csv(filepath):
+    """Load an RGB CSV (space-separated R G B per cell) as three float arrays.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        Input CSV file with space-separated R G B values per cell.
+
+    Returns
+    -------
+    r_data, g_data, b_data : ndarray
+        Channel arrays of shape (height, width).
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    if not raw:
+        raise ValueError(f"{filepath} is empty")
+
+    height = raw.count(b'\n') + (0 if raw.endswith(b'\n') else 1)
+    width = len(raw.partition(b'\n')[0].strip().split(b','))
+
+    # Fast path for a regular grid: with one cell per line, np.loadtxt parses
+    # everything in C and rejects any cell whose value count differs from the
+    # rest, so only all-RGB or all-single-value grids are accepted here
+    cells = None
+    if rows_have_width(raw, height, width):
+        try:
+            cells = np.loadtxt(io.BytesIO(raw.replace(b',', b'\n')), comments=None, ndmin=2)
+        except ValueError:
+            pass
+    del raw
+    if cells is not None and cells.shape == (height * width, 3):
+        rgb = cells.reshape(height, width, 3).transpose(2, 0, 1)
+        r_data, g_data, b_data = np.ascontiguousarray(rgb)
+        return r_data, g_data, b_data
+    if cells is not None and cells.shape == (height * width, 1):
+        gray = cells.reshape(height, width)
+        return gray, gray.copy(), gray.copy()
+
+    # Mixed or irregular cells: re-read as text and parse cell by cell
+    with open(filepath, 'r') as f:
+        text = f.read()
+    height = text.count('\n') + (0 if text.endswith('\n') else 1)
+    width = len(text.partition('\n')[0].strip().split(','))
+    return parse_rgb_cells(text.split('\n')[:height], width)
+
+def process_rgb(filepath, output_json=None, output_image=None):
+    """Process RGB sensor data - evaluate and visualize.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        Input CSV file with space-separated R G B values per cell.
+    output_json : str or Path, optional
+        Path for metrics JSON output. Uses CONFIG when omitted.
+    output_image : str or Path, optional
+        Path for visualization PNG. Uses CONFIG when omitted.
+    """
+    print(f"\n📊 Processing RGB data: {filepath}")
+    
+    # Load RGB data
+    try:
+        r_data, g_data, b_data = load_rgb_csv(filepath)
+    except Exception as e:
+        print(f"❌ Error loading file: {e}")
+        sys.exit(1)
+    height, width = r_data.shape
     
     # Get parameters
     pixel_pitch = CONFIG.get('pixel_pitch', 2.4)
@@ -204,110 +480,91 @@ def process_rgb(filepath, output_json=None, output_image=None):
     direct_threshold = CONFIG.get('direct_threshold', 200)
     light_threshold = CONFIG.get('light_threshold', 250)
     beta = CONFIG.get('beta', 0.5)
-    
-    print("\n" + "="*60)
-    print("FLARE EVALUATION RESULTS (RGB)")
-    print("="*60)
-    print(f"Sensor: {height}×{width} pixels (RGB)")
-    print(f"Pixel pitch: {pixel_pitch:.2f} µm")
+    check_parameters(pixel_pitch, beta)
     
     results = {'mode': 'rgb', 'channels': {}}
     
-    # Process each channel
+    # Evaluate each channel
     for channel_name, data in [('R', r_data), ('G', g_data), ('B', b_data)]:
-        # Classify pixels
-        flare_mask = (data > offset + signal_threshold) & (data <= direct_threshold)
-        direct_mask = (data > direct_threshold) & (data <= light_threshold)
-        light_mask = data > light_threshold
-        
-        N_sensor = data.size
-        N_flare = np.sum(flare_mask)
-        N_direct = np.sum(direct_mask)
-        
-        # Calculate metrics
-        if N_flare > 0:
-            flare_values = data[flare_mask] - offset
-            F_raw = np.sum(flare_values) / (N_flare * pixel_area)
-        else:
-            F_raw = 0
-        
-        F_norm = 0
-        if N_flare > 0 and N_direct > 0:
-            flare_values = data[flare_mask] - offset
-            direct_values = data[direct_mask] - offset
-            flare_intensity = np.sum(flare_values) / (N_flare * pixel_area)
-            direct_intensity = np.sum(direct_values) / (N_direct * pixel_area)
-            if direct_intensity > 0:
-                F_norm = flare_intensity / direct_intensity
-        
-        coverage_ratio = N_flare / N_sensor if N_sensor > 0 else 0
-        F_final = F_norm * (coverage_ratio ** beta)
-        
-        print(f"\n📊 {channel_name} Channel:")
-        print(f"  F_raw:   {F_raw:.4f} ADU/µm²")
-        print(f"  F_norm:  {F_norm:.4f}")
-        print(f"  F_final: {F_final:.6f}")
-        print(f"  Flare pixels: {N_flare:,} ({coverage_ratio*100:.2f}%)")
-        
-        results['channels'][channel_name] = {
-            'F_raw': F_raw,
-            'F_norm': F_norm,
-            'F_final': F_final,
-            'flare_pixels': int(N_flare),
-            'coverage_percent': coverage_ratio * 100
-        }
-    
+        results['channels'][channel_name] = evaluate_channel(
+            data, offset, signal_threshold, direct_threshold, light_threshold, pixel_area, beta)
+
     # Calculate average metrics across channels
     avg_F_raw = np.mean([ch['F_raw'] for ch in results['channels'].values()])
     avg_F_norm = np.mean([ch['F_norm'] for ch in results['channels'].values()])
     avg_F_final = np.mean([ch['F_final'] for ch in results['channels'].values()])
     
-    print(f"\n📊 Average Across Channels:")
-    print(f"  F_raw:   {avg_F_raw:.4f} ADU/µm²")
-    print(f"  F_norm:  {avg_F_norm:.4f}")
-    print(f"  F_final: {avg_F_final:.6f}")
-    
     results['average'] = {
         'F_raw': avg_F_raw,
         'F_norm': avg_F_norm,
         'F_final': avg_F_final
     }
     
-    print("="*60)
+    # Display results (one write, so parallel bulk runs don't interleave lines)
+    report = [
+        "\n" + SEPARATOR,
+        "FLARE EVALUATION RESULTS (RGB)",
+        SEPARATOR,
+        f"Sensor: {height}×{width} pixels (RGB)",
+        f"Pixel pitch: {pixel_pitch:.2f} µm",
+    ]
+    for channel_name, ch in results['channels'].items():
+        report += [
+            f"\n📊 {channel_name} Channel:",
+            f"  F_raw:   {ch['F_raw']:.4f} ADU/µm²",
+            f"  F_norm:  {ch['F_norm']:.4f}",
+            f"  F_final: {ch['F_final']:.6f}",
+            f"  Flare pixels: {ch['flare_pixels']:,} ({ch['coverage_percent']:.2f}%)",
+        ]
+    report += [
+        f"\n📊 Average Across Channels:",
+        f"  F_raw:   {avg_F_raw:.4f} ADU/µm²",
+        f"  F_norm:  {avg_F_norm:.4f}",
+        f"  F_final: {avg_F_final:.6f}",
+        SEPARATOR,
+    ]
+    print("\n".join(report))
     
     # Save JSON results
     if output_json is None:
         output_json = CONFIG.get('output_json', 'output/results.json')
-    Path(output_json).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_json, 'w') as f:
-        json.dump(results, f, indent=2)
+    save_json(results, output_json)
     print(f"\n✅ Results saved to: {output_json}")
     
+    if not CONFIG.get('save_image', True):
+        return results
+    
     # Create RGB visualization
     print(f"\n🎨 Creating RGB visualization...")
 
-    # Normalize channels to displayable range
-    r_norm = np.clip((r_data / 1023) * 255, 0, 255).astype(np.uint8)
-    g_norm = np.clip((g_data / 1023) * 255, 0, 255).astype(np.uint8)
-    b_norm = np.clip((b_data / 1023) * 255, 0, 255).astype(np.uint8)
-    img = np.stack([r_norm, g_norm, b_norm], axis=-1)
+    # Normalize channels to displayable range, writing straight into the image
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    scaled = np.empty_like(r_data)
+    for channel_idx, channel in enumerate((r_data, g_data, b_data)):
+        np.divide(channel, 1023, out=scaled)
+        scaled *= 255
+        np.clip(scaled, 0, 255, out=scaled)
+        img[:, :, channel_idx] = scaled
 
-    # Classification using luminance
-    lum_data = 0.299 * r_data + 0.587 * g_data + 0.114 * b_data
-    flare_mask = (lum_data > offset + signal_threshold) & (lum_data <= direct_threshold)
-    direct_mask = (lum_data > direct_threshold) & (lum_data <= light_threshold)
-    light_mask = lum_data > light_threshold
+    # Classification using luminance (accumulated in place, reusing the
+    # normalization buffer for the weighted terms)
+    lum_data = r_data * 0.299
+    np.multiply(g_data, 0.587, out=scaled)
+    lum_data += scaled
+    np.multiply(b_data, 0.114, out=scaled)
+    lum_data += scaled
+    del scaled
+    lum_labels = label_pixels(lum_data, offset, signal_threshold, direct_threshold, light_threshold)
+    del lum_data
 
     # Color code regions (same scheme as grayscale)
-    img[flare_mask] = [255, 255, 0]      # Yellow for flare
-    img[direct_mask] = [255, 165, 0]     # Orange for direct illumination
-    img[light_mask] = [255, 0, 0]        # Red for light sources
+    classified = lum_labels > 0
+    img[classified] = CLASS_COLORS[lum_labels[classified]]
 
     # Save image
     if output_image is None:
         output_image = CONFIG.get('output_image', 'output/visualization.png')
-    Path(output_image).parent.mkdir(parents=True, exist_ok=True)
-    Image.fromarray(img).save(output_image)
+    save_visualization(img, output_image)
     print(f"✅ RGB visualization saved to: {output_image}")
     
     return results
@@ -343,6 +600,8 @@ mode         - 'grayscale' or 'rgb'
 input_file   - Input CSV file path
 output_json  - Output JSON results path
 output_image - Output visualization path
+save_image   - Set False to skip the visualization (metrics only)
+png_compress_level - PNG compression, 1 (fastest) to 9 (smallest)
 pixel_pitch  - Sensor pixel pitch in micrometers
 offset       - Black level/offset in ADU
 signal_threshold - Minimum signal above offset
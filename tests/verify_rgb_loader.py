@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Check flare.load_rgb_csv against the reference per-cell RGB parser"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from flare import load_rgb_csv
+
+
+def reference_parse(filepath):
+    """Original line-by-line parser: 3 values or 1 value per cell, else zero."""
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+
+    height = len(lines)
+    width = len(lines[0].strip().split(','))
+    channels = np.zeros((3, height, width))
+
+    for row_idx, line in enumerate(lines):
+        for col_idx, cell in enumerate(line.strip().split(',')):
+            values = cell.strip().split()
+            if len(values) == 3:
+                channels[:, row_idx, col_idx] = [float(v) for v in values]
+            elif len(values) == 1:
+                channels[:, row_idx, col_idx] = float(values[0])
+
+    return tuple(channels)
+
+
+def outcome(loader, filepath):
+    """Return the loaded channels, or the exception type the loader raised."""
+    try:
+        return loader(filepath)
+    except Exception as e:
+        return type(e)
+
+
+malformed_cases = {
+    "mixed value counts": "100 100 100,100 100,100 100 100 100\n",
+    "ragged rows": "1 2 3,4 5 6,7 8 9\n1 2 3,4 5 6,7 8 9,1 2 3\n1 2 3,4 5 6\n",
+    "blank row": "1 2 3,4\n\n",
+    "empty cell": "1 2 3,,4 5 6\n",
+    "grayscale and RGB cells": "100,100 110 120\n130 140 150,160\n",
+    "CRLF line endings": "1 2 3,4 5 6\r\n7 8 9,10 11 12\r\n",
+    "no trailing newline": "1\t2\t3,  4 5 6  \n7 8 9,10 11 12",
+    "comment character": "1 2 3 #4,5 6 7\n",
+    "non-numeric value": "1 2 x,4 5 6\n",
+}
+
+print("Testing load_rgb_csv against the reference parser:")
+print("=" * 50)
+
+failures = 0
+with tempfile.TemporaryDirectory() as tmp:
+    files = sorted((ROOT / 'tests').glob('*.csv'))
+    for i, (name, text) in enumerate(malformed_cases.items()):
+        path = Path(tmp) / f"case_{i}.csv"
+        path.write_text(text)
+        files.append(path)
+    names = {Path(tmp) / f"case_{i}.csv": name for i, name in enumerate(malformed_cases)}
+
+    for filepath in files:
+        label = names.get(filepath, filepath.name)
+        expected = outcome(reference_parse, filepath)
+        actual = outcome(load_rgb_csv, filepath)
+        if isinstance(expected, type) or isinstance(actual, type):
+            ok = expected is actual
+        else:
+            ok = all(np.array_equal(e, a) for e, a in zip(expected, actual))
+        if ok:
+            print(f"✅ {label}")
+        else:
+            failures += 1
+            print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+
+print("-" * 50)
+if failures:
+    print(f"{failures} case(s) differ from the reference parser")
+    sys.exit(1)
+print("All cases match the reference parser")